@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class FileuploadConfig(AppConfig):
     name = 'fileupload'
+
+    def ready(self):
+        # Import the URLconf and compile every route's regex at startup so
+        # the first request doesn't pay for it
+        from django.urls import get_resolver
+        get_resolver().reverse_dict
@@ -3,13 +3,68 @@ Azure Blob Storage Service
 
 This service handles file uploads to Azure Blob Storage using managed identity authentication.
 """
-from azure.storage.blob import BlobServiceClient
+from azure.core.exceptions import HttpResponseError
+from azure.storage.blob import BlobServiceClient, ContentSettings
 from azure.identity import DefaultAzureCredential
 from django.conf import settings
+import contextlib
+import functools
+import os
+import threading
+import time
 import uuid
 from datetime import datetime, timezone
 
 
+# Read buffer for uploads streamed from disk; the default is 8 KiB
+UPLOAD_READ_BUFFER_SIZE = 1024 * 1024
+
+
+class InvalidContinuationToken(Exception):
+    """Raised when Azure rejects a client-supplied listing continuation token."""
+
+
+@functools.lru_cache(maxsize=1)
+def get_blob_service_client(account_url):
+    """
+    Return a shared BlobServiceClient for the given account URL.
+    
+    Reusing one client (and its DefaultAzureCredential) keeps the credential's
+    token cache and the HTTPS connection pool alive across requests.
+    """
+    return BlobServiceClient(
+        account_url=account_url,
+        credential=DefaultAzureCredential(),
+        max_single_put_size=settings.AZURE_UPLOAD_MAX_SINGLE_PUT_SIZE,
+        max_block_size=settings.AZURE_UPLOAD_MAX_BLOCK_SIZE
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _content_settings(content_type):
+    """Return a shared ContentSettings for the given MIME type."""
+    return ContentSettings(content_type=content_type)
+
+
+_SERVICE = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_storage_service():
+    """
+    Return the process-wide AzureBlobStorageService, creating it on first use.
+    
+    Raises:
+        ValueError: If AZURE_STORAGE_ACCOUNT_NAME is not configured
+    """
+    global _SERVICE
+    if _SERVICE is None:
+        with _SERVICE_LOCK:
+            if _SERVICE is None:
+                _SERVICE = AzureBlobStorageService()
+    return _SERVICE
+
+
 class AzureBlobStorageService:
     """
     Service for uploading files to Azure Blob Storage using managed identity.
@@ -22,22 +77,45 @@ class AzureBlobStorageService:
     """
     
     def __init__(self):
-        """Initialize the blob service client with managed identity."""
+        """Initialize the service with the shared managed identity blob client."""
         self.account_name = settings.AZURE_STORAGE_ACCOUNT_NAME
         self.container_name = settings.AZURE_STORAGE_CONTAINER_NAME
         
         if not self.account_name:
             raise ValueError("AZURE_STORAGE_ACCOUNT_NAME must be configured")
         
-        # Create blob service client using managed identity
+        # Reuse the process-wide blob service client (managed identity)
         account_url = f"https://{self.account_name}.blob.core.windows.net"
-        credential = DefaultAzureCredential()
-        self.blob_service_client = BlobServiceClient(
-            account_url=account_url,
-            credential=credential
-        )
+        self.blob_service_client = get_blob_service_client(account_url)
         
-    def upload_file(self, file, filename=None, user_id=None):
+    def generate_blob_name(self, original_filename, user_id=None):
+        """
+        Generate a unique blob name for a file.
+        
+        Args:
+            original_filename: Name of the uploaded file, used for its extension
+            user_id: Optional user identifier to organize files by user
+            
+        Returns:
+            str: Timestamped unique blob name, prefixed with the user_id if given
+        """
+        file_extension = os.path.splitext(original_filename)[1]  # includes the dot
+        timestamp = time.strftime('%Y%m%d_%H%M%S', time.gmtime())
+        blob_name = f"{timestamp}_{uuid.uuid4().hex}{file_extension}"
+        
+        # Organize blobs by user if provided
+        if user_id:
+            blob_name = f"{user_id}/{blob_name}"
+        return blob_name
+    
+    def get_blob_url(self, blob_name):
+        """Return the URL of a blob in the configured container."""
+        return self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=blob_name
+        ).url
+    
+    def upload_file(self, file, filename=None, user_id=None, blob_name=None):
         """
         Upload a file to Azure Blob Storage.
         
@@ -45,6 +123,8 @@ class AzureBlobStorageService:
             file: The file object to upload (from request.FILES)
             filename: Optional custom filename. If not provided, uses original name
             user_id: Optional user identifier to organize files by user
+            blob_name: Optional blob name reserved in advance. If not provided,
+                a unique name is generated
             
         Returns:
             dict: Contains blob_url, blob_name, and other metadata
@@ -53,17 +133,9 @@ class AzureBlobStorageService:
             Exception: If upload fails
         """
         try:
-            # Generate unique blob name
             original_filename = filename or file.name
-            file_extension = original_filename.split('.')[-1] if '.' in original_filename else ''
-            unique_id = str(uuid.uuid4())
-            timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
-            
-            # Construct blob name with user organization if provided
-            if user_id:
-                blob_name = f"{user_id}/{timestamp}_{unique_id}.{file_extension}"
-            else:
-                blob_name = f"{timestamp}_{unique_id}.{file_extension}"
+            if blob_name is None:
+                blob_name = self.generate_blob_name(original_filename, user_id)
             
             # Get blob client
             blob_client = self.blob_service_client.get_blob_client(
@@ -71,9 +143,24 @@ class AzureBlobStorageService:
                 blob=blob_name
             )
             
-            # Upload file
-            file.seek(0)  # Reset file pointer to beginning
-            blob_client.upload_blob(file.read(), overwrite=True)
+            # Large uploads are already spooled to disk by Django; read those
+            # through a fresh handle with a large buffer
+            if hasattr(file, 'temporary_file_path'):
+                stream_context = open(file.temporary_file_path(), 'rb', buffering=UPLOAD_READ_BUFFER_SIZE)
+            else:
+                file.seek(0)  # Reset file pointer to beginning
+                stream_context = contextlib.nullcontext(file)
+            
+            # Stream the file to Azure; the SDK reads it in blocks instead of
+            # loading the whole upload into memory and PUTs blocks in parallel
+            with stream_context as stream:
+                blob_client.upload_blob(
+                    stream,
+                    length=file.size,
+                    overwrite=True,
+                    max_concurrency=settings.AZURE_UPLOAD_CONCURRENCY,
+                    content_settings=_content_settings(file.content_type or 'application/octet-stream')
+                )
             
             # Get blob URL
             blob_url = blob_client.url
@@ -91,12 +178,16 @@ class AzureBlobStorageService:
         except Exception as e:
             raise Exception(f"Failed to upload file to Azure Blob Storage: {str(e)}")
     
-    def list_blobs(self, user_id=None):
+    def list_blobs(self, user_id=None, results_per_page=1000):
         """
         List blobs in the container, optionally filtered by user_id.
         
+        The user_id filter is applied by Azure as a name prefix, so only the
+        user's blobs are transferred, fetched one page at a time.
+        
         Args:
             user_id: Optional user identifier to filter blobs
+            results_per_page: Maximum number of blobs fetched per request
             
         Returns:
             list: List of blob metadata dictionaries
@@ -106,23 +197,68 @@ class AzureBlobStorageService:
                 self.container_name
             )
             
-            blobs = []
-            blob_list = container_client.list_blobs()
+            blob_pages = container_client.list_blobs(
+                name_starts_with=f"{user_id}/" if user_id else None,
+                results_per_page=results_per_page
+            ).by_page()
+            
+            return [
+                self._blob_metadata(blob)
+                for page in blob_pages
+                for blob in page
+            ]
+            
+        except Exception as e:
+            raise Exception(f"Failed to list blobs: {str(e)}")
+    
+    def list_blobs_page(self, user_id=None, page_size=100, continuation_token=None):
+        """
+        List a single page of blobs, optionally filtered by user_id.
+        
+        Args:
+            user_id: Optional user identifier to filter blobs
+            page_size: Maximum number of blobs to return
+            continuation_token: Token returned with the previous page, or None
+                for the first page
+            
+        Returns:
+            tuple: List of blob metadata dictionaries and the continuation
+                token for the next page (None on the last page)
+        
+        Raises:
+            InvalidContinuationToken: If Azure rejects the continuation token
+        """
+        try:
+            container_client = self.blob_service_client.get_container_client(
+                self.container_name
+            )
             
-            for blob in blob_list:
-                # Filter by user_id if provided
-                if user_id and not blob.name.startswith(f"{user_id}/"):
-                    continue
-                    
-                blobs.append({
-                    'name': blob.name,
-                    'size': blob.size,
-                    'created_on': blob.creation_time.isoformat() if blob.creation_time else None,
-                    'last_modified': blob.last_modified.isoformat() if blob.last_modified else None,
-                    'content_type': blob.content_settings.content_type if blob.content_settings else None,
-                })
+            blob_pages = container_client.list_blobs(
+                name_starts_with=f"{user_id}/" if user_id else None,
+                results_per_page=page_size
+            ).by_page(continuation_token=continuation_token)
             
-            return blobs
+            blobs = [self._blob_metadata(blob) for blob in next(blob_pages, [])]
+            return blobs, blob_pages.continuation_token
             
+        except HttpResponseError as e:
+            # Continuation tokens come from the client; a malformed or stale one
+            # is bad input rather than a storage failure
+            if continuation_token is not None and e.status_code == 400:
+                raise InvalidContinuationToken(
+                    "The continuation_token is malformed or has expired"
+                ) from e
+            raise Exception(f"Failed to list blobs: {str(e)}")
         except Exception as e:
             raise Exception(f"Failed to list blobs: {str(e)}")
+    
+    @staticmethod
+    def _blob_metadata(blob):
+        """Build the metadata dictionary returned for a listed blob."""
+        return {
+            'name': blob.name,
+            'size': blob.size,
+            'created_on': blob.creation_time and blob.creation_time.isoformat(),
+            'last_modified': blob.last_modified and blob.last_modified.isoformat(),
+            'content_type': blob.content_settings and blob.content_settings.content_type,
+        }
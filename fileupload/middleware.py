@@ -4,12 +4,21 @@ MSAL OAuth Authentication Middleware
 This middleware validates OAuth tokens using Microsoft Authentication Library (MSAL).
 It checks for a valid Bearer token in the Authorization header and validates it.
 
-SECURITY NOTE: This demo implementation does not verify JWT signatures.
-For production use, uncomment the signature verification code in the __call__ method.
+SECURITY NOTE: By default this demo implementation does not verify JWT signatures.
+For production use, set MSAL_VERIFY_SIGNATURE=True to verify tokens against
+Azure AD's published signing keys (JWKS).
 """
+import base64
+import hashlib
 import jwt
-import json
+import orjson
 import requests
+import threading
+import time
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
 from django.http import JsonResponse
 from functools import wraps
@@ -23,72 +32,108 @@ class MSALAuthMiddleware:
     - Checks for Authorization header with Bearer token
     - Validates the token against Microsoft's public keys
     - Sets user information in request if valid
-    - Allows public endpoints without authentication
+    - Allows public endpoints and CORS preflight (OPTIONS) requests without authentication
+    
+    It supports both sync (WSGI) and async (ASGI) middleware chains, so it
+    does not force a thread hop when the rest of the stack is async.
     """
     
-    # Public endpoints that don't require authentication
-    PUBLIC_PATHS = ['/admin/', '/api/health/']
+    sync_capable = True
+    async_capable = True
+    
+    # Paths under this prefix always require a Bearer token
+    API_PREFIX = '/api/'
+    
+    # Public endpoints that don't require authentication: prefixes are kept in
+    # a tuple so one str.startswith call checks them all
+    PUBLIC_PATHS = ('/admin/', '/api/health/', '/static/')
+    PUBLIC_EXACT_PATHS = frozenset({'/', '/api/health'})
+    
+    # Seconds a fetched JWKS is trusted before it is fetched again
+    JWKS_CACHE_TTL = 300
+    # Minimum seconds between refreshes triggered by an unknown key ID
+    JWKS_MIN_REFRESH_INTERVAL = 30
+    # (connect, read) timeouts in seconds for JWKS fetches
+    JWKS_FETCH_TIMEOUT = (1.0, 2.0)
+    # Validated tokens are remembered for up to TOKEN_CACHE_TTL seconds
+    TOKEN_CACHE_TTL = 60
+    TOKEN_CACHE_MAXSIZE = 10000
     
     def __init__(self, get_response):
         self.get_response = get_response
         self.jwks_uri = f"https://login.microsoftonline.com/{settings.MSAL_TENANT_ID}/discovery/v2.0/keys"
+        # One pooled keep-alive session for all JWKS fetches (requests already
+        # asks for gzip-compressed responses by default)
+        self._http = requests.Session()
+        self._http.mount('https://', HTTPAdapter(
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.2)
+        ))
+        self._jwks_lock = threading.Lock()
+        self._jwks_cache = {}
+        self._jwks_fetched_at = 0
+        # After a failed fetch, no new fetch is attempted before this time
+        self._jwks_retry_after = 0
+        self._token_cache = OrderedDict()
+        self._token_cache_lock = threading.Lock()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
         
     def __call__(self, request):
-        # Skip authentication for public paths (exact match for root, startswith for others)
-        if request.path == '/' or any(request.path.startswith(path) for path in self.PUBLIC_PATHS):
-            return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.authenticate(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+    
+    async def __acall__(self, request):
+        if self.is_public(request) or (
+            request.path.startswith(self.API_PREFIX) and not self._may_fetch_jwks(request)
+        ):
+            response = self.authenticate(request)
+        else:
+            # Off the API the session user may be loaded, which queries the
+            # database; JWKS fetches block on the network and the JWKS lock
+            response = await sync_to_async(self.authenticate)(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+    
+    def authenticate(self, request):
+        """
+        Authenticate the request from its Bearer token.
         
-        # Get authorization header
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+        Returns:
+            None if the request may proceed (public path, session user outside
+            the API, or valid token), otherwise a 401 JsonResponse to return
+            to the client.
+        """
+        # CORS preflight requests never carry a Bearer token
+        if request.method == 'OPTIONS' or self.is_public(request):
+            return None
         
-        if not auth_header.startswith('Bearer '):
+        # Outside the API, users already logged in through Django's session
+        # auth (e.g. the admin) don't need a Bearer token
+        if not request.path.startswith(self.API_PREFIX):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                return None
+        
+        # A bare "Bearer " is rejected here rather than paying for a token
+        # decode that can only fail
+        token = self._bearer_token(request)
+        
+        if not token:
             return JsonResponse({
                 'error': 'Missing or invalid Authorization header',
                 'message': 'Please provide a valid Bearer token'
             }, status=401)
         
-        token = auth_header.split('Bearer ')[1]
-        
         # Validate token
         try:
-            # IMPORTANT: For production, uncomment the code below to enable proper JWT signature verification
-            # This demo code bypasses signature verification for ease of testing
-            # Production implementation should:
-            # 1. Fetch JWKS (JSON Web Key Set) from Microsoft
-            # 2. Find the correct key using 'kid' (key ID) from token header
-            # 3. Verify token signature using public key
-            # 4. Validate token claims (issuer, audience, expiry)
-            
-            # Production JWT verification example:
-            # unverified_header = jwt.get_unverified_header(token)
-            # kid = unverified_header.get('kid')
-            # response = requests.get(self.jwks_uri)
-            # jwks = response.json()
-            # public_key = None
-            # for key in jwks['keys']:
-            #     if key['kid'] == kid:
-            #         public_key = jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(key))
-            #         break
-            # if not public_key:
-            #     raise jwt.InvalidTokenError("Public key not found")
-            # claims = jwt.decode(
-            #     token,
-            #     public_key,
-            #     algorithms=['RS256'],
-            #     audience=settings.MSAL_CLIENT_ID,
-            #     issuer=f'https://login.microsoftonline.com/{settings.MSAL_TENANT_ID}/v2.0'
-            # )
-            
-            # Current demo implementation (NOT SECURE for production):
-            unverified_header = jwt.get_unverified_header(token)
-            unverified_claims = jwt.decode(token, options={"verify_signature": False})
-            
             # Store user info in request for use in views
-            request.user_info = {
-                'user_id': unverified_claims.get('oid', ''),
-                'email': unverified_claims.get('preferred_username', ''),
-                'name': unverified_claims.get('name', ''),
-            }
+            request.user_info = self._get_user_info(token)
             request.token_validated = True
             
         except jwt.ExpiredSignatureError:
@@ -107,5 +152,213 @@ class MSALAuthMiddleware:
                 'message': str(e)
             }, status=401)
         
-        response = self.get_response(request)
-        return response
+        return None
+    
+    def is_public(self, request):
+        """Return True if the path needs no authentication."""
+        path = request.path
+        return path in self.PUBLIC_EXACT_PATHS or path.startswith(self.PUBLIC_PATHS)
+    
+    def _get_user_info(self, token):
+        """
+        Return the user info for a token, decoding it only on a cache miss.
+        
+        Clients replay the same token for many requests, so validated tokens
+        are cached by hash until TOKEN_CACHE_TTL elapses or the token expires.
+        Lookups are a single dict read; the lock only guards insertion and
+        eviction, and the oldest entry is evicted first when the cache is full.
+        
+        Raises:
+            jwt.ExpiredSignatureError: If the cached token has expired
+        """
+        key = self._token_cache_key(token)
+        now = time.time()
+        entry = self._token_cache.get(key)
+        if entry is not None:
+            user_info, expires_at, exp = entry
+            if expires_at > now:
+                return user_info
+            with self._token_cache_lock:
+                self._token_cache.pop(key, None)
+            if exp is not None and exp <= now:
+                raise jwt.ExpiredSignatureError("Signature has expired")
+        
+        claims = self._decode_claims(token)
+        user_info = {
+            'user_id': claims.get('oid', ''),
+            'email': claims.get('preferred_username', ''),
+            'name': claims.get('name', ''),
+        }
+        expires_at = now + self.TOKEN_CACHE_TTL
+        exp = claims.get('exp')
+        if not isinstance(exp, (int, float)):
+            exp = None
+        elif exp < expires_at:
+            expires_at = exp
+        
+        with self._token_cache_lock:
+            self._token_cache[key] = (user_info, expires_at, exp)
+            if len(self._token_cache) > self.TOKEN_CACHE_MAXSIZE:
+                self._token_cache.popitem(last=False)
+        return user_info
+    
+    @staticmethod
+    def _bearer_token(request):
+        """Return the Bearer token from the Authorization header, or '' if there is none."""
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+        return auth_header[7:].strip() if auth_header.startswith('Bearer ') else ''
+    
+    @staticmethod
+    def _token_cache_key(token):
+        """Return the token cache key for a token."""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+    
+    def _may_fetch_jwks(self, request):
+        """
+        Return whether authenticating the request may fetch the JWKS.
+        
+        Only a token that is neither cached nor signed by a fresh cached key
+        can need a fetch; the check reads no more than the caches.
+        """
+        if not settings.MSAL_VERIFY_SIGNATURE:
+            return False
+        token = self._bearer_token(request)
+        if not token:
+            return False
+        
+        entry = self._token_cache.get(self._token_cache_key(token))
+        if entry is not None and entry[1] > time.time():
+            return False
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+        except jwt.InvalidTokenError:
+            # Rejected before any key lookup
+            return False
+        return self._cached_signing_key(kid) is None
+    
+    def _decode_claims(self, token):
+        """
+        Decode the token and return its claims.
+        
+        With MSAL_VERIFY_SIGNATURE enabled the signature, issuer, audience and
+        expiry are verified using the cached Azure AD signing keys.
+        """
+        if settings.MSAL_VERIFY_SIGNATURE:
+            kid = jwt.get_unverified_header(token).get('kid')
+            return jwt.decode(
+                token,
+                self._get_signing_key(kid),
+                algorithms=['RS256'],
+                audience=settings.MSAL_CLIENT_ID,
+                issuer=f'https://login.microsoftonline.com/{settings.MSAL_TENANT_ID}/v2.0'
+            )
+        
+        # Demo implementation (NOT SECURE for production): signature is not checked
+        return self._decode_unverified(token)
+    
+    @staticmethod
+    def _decode_unverified(token):
+        """
+        Read a token's claims without verifying its signature.
+        
+        The segments are decoded directly instead of going through PyJWT, but
+        malformed and expired tokens raise the same PyJWT exceptions.
+        """
+        try:
+            header_b64, payload_b64, _ = token.split('.')
+            header = orjson.loads(base64.urlsafe_b64decode(header_b64 + '=' * (-len(header_b64) % 4)))
+            claims = orjson.loads(base64.urlsafe_b64decode(payload_b64 + '=' * (-len(payload_b64) % 4)))
+        except ValueError as e:
+            raise jwt.DecodeError(f"Invalid token: {e}") from e
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise jwt.DecodeError("Invalid token: header and payload must be JSON objects")
+        
+        exp = claims.get('exp')
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise jwt.DecodeError("Expiration Time claim (exp) must be a number")
+            if exp <= time.time():
+                raise jwt.ExpiredSignatureError("Signature has expired")
+        return claims
+    
+    def _get_signing_key(self, kid):
+        """
+        Return the public key for the given key ID from the cached JWKS.
+        
+        The key set is fetched again once it is older than JWKS_CACHE_TTL, or
+        when the key ID is unknown (Azure AD rotates its signing keys), at most
+        once per JWKS_MIN_REFRESH_INTERVAL. A failed fetch is not retried for
+        JWKS_MIN_REFRESH_INTERVAL either, so an Azure AD outage doesn't send
+        every request through the lock to fetch again.
+        
+        Raises:
+            jwt.InvalidTokenError: If no key matches the key ID
+        """
+        key = self._cached_signing_key(kid)
+        if key is not None:
+            return key
+        
+        with self._jwks_lock:
+            # Another thread may have refreshed the keys while we waited
+            key = self._jwks_cache.get(kid)
+            now = time.time()
+            age = now - self._jwks_fetched_at
+            if now >= self._jwks_retry_after and (
+                age >= self.JWKS_CACHE_TTL or (key is None and age >= self.JWKS_MIN_REFRESH_INTERVAL)
+            ):
+                try:
+                    self._refresh_jwks()
+                except (requests.RequestException, ValueError):
+                    self._jwks_retry_after = time.time() + self.JWKS_MIN_REFRESH_INTERVAL
+                    # Keep using a stale key rather than failing every request
+                    if key is None:
+                        raise
+                else:
+                    key = self._jwks_cache.get(kid)
+        
+        if key is None:
+            raise jwt.InvalidTokenError("Public key not found")
+        return key
+    
+    def _cached_signing_key(self, kid):
+        """
+        Return the cached key for the key ID if it can be used without a fetch.
+        
+        That is the case while the key set is younger than JWKS_CACHE_TTL, or
+        while a failed refresh is backing off.
+        """
+        key = self._jwks_cache.get(kid)
+        if key is not None:
+            now = time.time()
+            if now - self._jwks_fetched_at < self.JWKS_CACHE_TTL or now < self._jwks_retry_after:
+                return key
+        return None
+    
+    def _refresh_jwks(self):
+        """
+        Fetch the JWKS and pre-build a public key for each signing key.
+        
+        The cached key set is only replaced once the response has been parsed.
+        Individual malformed keys are skipped.
+        
+        Raises:
+            requests.RequestException: If the fetch fails
+            ValueError: If the response is not a JSON key set
+        """
+        response = self._http.get(self.jwks_uri, timeout=self.JWKS_FETCH_TIMEOUT)
+        response.raise_for_status()
+        payload = orjson.loads(response.content)
+        keys = payload.get('keys') if isinstance(payload, dict) else None
+        if not isinstance(keys, list):
+            raise ValueError("JWKS response does not contain a key list")
+        
+        jwks = {}
+        for key in keys:
+            if not isinstance(key, dict) or key.get('kty') != 'RSA' or 'kid' not in key:
+                continue
+            try:
+                jwks[key['kid']] = jwt.algorithms.RSAAlgorithm.from_jwk(key)
+            except (jwt.InvalidKeyError, ValueError, TypeError):
+                continue
+        self._jwks_cache = jwks
+        self._jwks_fetched_at = time.time()
@@ -0,0 +1,35 @@
+"""
+API Renderers
+
+This module contains a DRF JSON renderer backed by orjson, which serializes
+API responses considerably faster than the stdlib json encoder.
+"""
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+# Types orjson doesn't know natively (lazy translation strings, Decimal, ...)
+# fall back to DRF's own encoder
+_encode_fallback = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Render API responses to JSON bytes with orjson."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Serialize ``data`` to UTF-8 encoded JSON.
+        
+        Indented output (``; indent=N`` in the Accept header, or the browsable
+        API's pretty-printing) is left to DRF's renderer, since orjson only
+        indents by two spaces.
+        """
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data,
+            default=_encode_fallback,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        )
@@ -0,0 +1,133 @@
+"""
+Background Upload Tasks
+
+This module runs Azure Blob Storage uploads on a process-wide thread pool so
+the upload endpoint can respond before the transfer to Azure has finished.
+"""
+import functools
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+from .azure_storage import UPLOAD_READ_BUFFER_SIZE, get_storage_service
+
+logger = logging.getLogger(__name__)
+
+
+class UploadQueueFull(Exception):
+    """Raised when AZURE_UPLOAD_MAX_PENDING background uploads are already pending."""
+
+
+@functools.lru_cache(maxsize=1)
+def _pending_uploads():
+    """Return the semaphore that bounds queued and running background uploads."""
+    return threading.BoundedSemaphore(settings.AZURE_UPLOAD_MAX_PENDING)
+
+
+@functools.lru_cache(maxsize=1)
+def get_upload_executor():
+    """Return the shared thread pool that runs background uploads."""
+    return ThreadPoolExecutor(
+        max_workers=settings.AZURE_UPLOAD_WORKERS,
+        thread_name_prefix='azure-upload'
+    )
+
+
+def enqueue_upload(file, user_id=None):
+    """
+    Queue a file for upload to Azure Blob Storage and return immediately.
+
+    Django deletes request uploads once the response is sent, so the task is
+    handed its own spooled copy of the file. The blob name is reserved up
+    front, so clients can find the blob in the file list once the upload
+    completes; a failed upload is only logged, and the blob never appears.
+    At most AZURE_UPLOAD_MAX_PENDING uploads may be queued or running at once,
+    since each one holds a spool file on disk.
+
+    Args:
+        file: The file object to upload (from request.FILES)
+        user_id: Optional user identifier to organize files by user
+
+    Returns:
+        dict: Contains the reserved blob_name, blob_url and file metadata
+
+    Raises:
+        UploadQueueFull: If too many uploads are already pending
+        ValueError: If Azure Storage is not configured
+    """
+    pending_uploads = _pending_uploads()
+    if not pending_uploads.acquire(blocking=False):
+        raise UploadQueueFull("Too many uploads are pending, please retry later")
+
+    # The slot is released by the task once it finishes, or here on failure
+    spool_path = None
+    try:
+        storage_service = get_storage_service()
+        blob_name = storage_service.generate_blob_name(file.name, user_id)
+        spool_path = _spool(file)
+        get_upload_executor().submit(
+            _upload_spooled_file,
+            spool_path, blob_name, file.name, file.content_type, file.size
+        )
+    except BaseException:
+        if spool_path is not None:
+            os.remove(spool_path)
+        pending_uploads.release()
+        raise
+
+    return {
+        'status': 'queued',
+        'blob_name': blob_name,
+        'blob_url': storage_service.get_blob_url(blob_name),
+        'original_filename': file.name,
+        'size': file.size,
+        'content_type': file.content_type,
+    }
+
+
+def _spool(file):
+    """
+    Return the path of a copy of the upload that the background task owns.
+    
+    Uploads Django already spooled to disk are hard-linked rather than copied,
+    so large files cost no extra I/O on the request thread.
+    """
+    if hasattr(file, 'temporary_file_path'):
+        source = file.temporary_file_path()
+        spool_path = os.path.join(os.path.dirname(source), f'azure-upload-{uuid.uuid4().hex}')
+        try:
+            os.link(source, spool_path)
+            return spool_path
+        except OSError:
+            pass  # Hard links unsupported here; fall back to copying
+    
+    fd, spool_path = tempfile.mkstemp(prefix='azure-upload-')
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            for chunk in file.chunks():
+                spool.write(chunk)
+    except BaseException:
+        os.remove(spool_path)
+        raise
+    return spool_path
+
+
+def _upload_spooled_file(spool_path, blob_name, original_filename, content_type, size):
+    """Upload a spooled file to its reserved blob name, then delete it and free its slot."""
+    try:
+        with open(spool_path, 'rb', buffering=UPLOAD_READ_BUFFER_SIZE) as stream:
+            get_storage_service().upload_file(
+                UploadedFile(stream, original_filename, content_type, size),
+                blob_name=blob_name
+            )
+    except Exception:
+        logger.exception("Background upload of %s failed", blob_name)
+    finally:
+        os.remove(spool_path)
+        _pending_uploads().release()
@@ -8,11 +8,14 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
-from .azure_storage import AzureBlobStorageService
+from .azure_storage import InvalidContinuationToken, get_storage_service
+from .tasks import UploadQueueFull, enqueue_upload
 
 
 def index(request):
@@ -30,6 +33,8 @@ class FileUploadView(APIView):
     - Requires valid OAuth Bearer token
     - Uploads file to Azure Blob Storage using managed identity
     - Returns blob URL and metadata
+    - With AZURE_UPLOAD_IN_BACKGROUND enabled, queues the upload and
+      returns 202 with the reserved blob name instead
     """
     permission_classes = [AllowAny]  # Auth handled by middleware
     
@@ -59,12 +64,19 @@ class FileUploadView(APIView):
                 'message': f'File size exceeds maximum allowed size of {max_size / (1024*1024)}MB'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get user info from request (set by middleware)
-        user_id = getattr(request, 'user_info', {}).get('user_id', 'anonymous')
+        # Get user info from request (set by middleware along with token_validated)
+        user_id = request.user_info['user_id']
         
         try:
-            # Initialize Azure Blob Storage service
-            storage_service = AzureBlobStorageService()
+            if settings.AZURE_UPLOAD_IN_BACKGROUND:
+                result = enqueue_upload(file=file, user_id=user_id)
+                return Response({
+                    'message': 'File upload accepted',
+                    'data': result
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Reuse the shared Azure Blob Storage service
+            storage_service = get_storage_service()
             
             # Upload file
             result = storage_service.upload_file(
@@ -77,6 +89,11 @@ class FileUploadView(APIView):
                 'data': result
             }, status=status.HTTP_201_CREATED)
             
+        except UploadQueueFull as e:
+            return Response({
+                'error': 'Upload queue full',
+                'message': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '30'})
         except ValueError as e:
             return Response({
                 'error': 'Configuration error',
@@ -97,8 +114,11 @@ class FileListView(APIView):
     GET /api/files/
     - Requires valid OAuth Bearer token
     - Returns list of files uploaded by the authenticated user
+    - Optional query parameters: page_size (1-5000) and continuation_token
+      return a single page plus the token for the next one
     """
     permission_classes = [AllowAny]  # Auth handled by middleware
+    max_page_size = 5000  # Azure's limit for a single List Blobs call
     
     def get(self, request):
         """Handle file list requests."""
@@ -109,12 +129,40 @@ class FileListView(APIView):
                 'message': 'Valid Bearer token is required'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        # Get user info from request (set by middleware)
-        user_id = getattr(request, 'user_info', {}).get('user_id', 'anonymous')
+        # Get user info from request (set by middleware along with token_validated)
+        user_id = request.user_info['user_id']
+        
+        page_size = request.GET.get('page_size')
+        continuation_token = request.GET.get('continuation_token')
+        paginated = page_size is not None or continuation_token is not None
+        if paginated:
+            try:
+                page_size = int(page_size or 100)
+            except ValueError:
+                page_size = 0
+            if not 1 <= page_size <= self.max_page_size:
+                return Response({
+                    'error': 'Invalid page_size',
+                    'message': f'page_size must be an integer between 1 and {self.max_page_size}'
+                }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Initialize Azure Blob Storage service
-            storage_service = AzureBlobStorageService()
+            # Reuse the shared Azure Blob Storage service
+            storage_service = get_storage_service()
+            
+            if paginated:
+                # List one page of files for user
+                blobs, next_token = storage_service.list_blobs_page(
+                    user_id=user_id,
+                    page_size=page_size,
+                    continuation_token=continuation_token
+                )
+                return Response({
+                    'message': 'Files retrieved successfully',
+                    'count': len(blobs),
+                    'data': blobs,
+                    'continuation_token': next_token
+                }, status=status.HTTP_200_OK)
             
             # List files for user
             blobs = storage_service.list_blobs(user_id=user_id)
@@ -125,6 +173,11 @@ class FileListView(APIView):
                 'data': blobs
             }, status=status.HTTP_200_OK)
             
+        except InvalidContinuationToken as e:
+            return Response({
+                'error': 'Invalid continuation_token',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except ValueError as e:
             return Response({
                 'error': 'Configuration error',
@@ -137,20 +190,23 @@ class FileListView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HealthCheckView(APIView):
+# The health payload never changes, so it is serialized once at import time
+_HEALTH_BODY = b'{"status":"healthy","message":"File upload service is running"}'
+
+
+@require_http_methods(['GET', 'HEAD', 'OPTIONS'])
+def health_check(request):
     """
     Health check endpoint (no authentication required).
     
     GET /api/health/
     - Returns application health status
     - Does not require authentication
+    - Served as a plain Django view, skipping DRF's content negotiation and
+      rendering on every liveness probe
     """
-    permission_classes = [AllowAny]
-    
-    def get(self, request):
-        """Handle health check requests."""
-        return Response({
-            'status': 'healthy',
-            'message': 'File upload service is running'
-        }, status=status.HTTP_200_OK)
-
+    if request.method == 'OPTIONS':
+        response = HttpResponse()
+        response['Allow'] = 'GET, HEAD, OPTIONS'
+        return response
+    return HttpResponse(_HEALTH_BODY, content_type='application/json')
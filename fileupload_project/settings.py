@@ -133,16 +133,33 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AZURE_STORAGE_ACCOUNT_NAME = os.getenv('AZURE_STORAGE_ACCOUNT_NAME', '')
 AZURE_STORAGE_CONTAINER_NAME = os.getenv('AZURE_STORAGE_CONTAINER_NAME', 'uploads')
 
+# Uploads larger than the single-put size are sent as staged blocks
+AZURE_UPLOAD_MAX_SINGLE_PUT_SIZE = int(os.getenv('AZURE_UPLOAD_MAX_SINGLE_PUT_SIZE', 8 * 1024 * 1024))
+AZURE_UPLOAD_MAX_BLOCK_SIZE = int(os.getenv('AZURE_UPLOAD_MAX_BLOCK_SIZE', 4 * 1024 * 1024))
+AZURE_UPLOAD_CONCURRENCY = int(os.getenv('AZURE_UPLOAD_CONCURRENCY', 8))
+
+# Respond to uploads immediately and transfer them to Azure on a thread pool
+AZURE_UPLOAD_IN_BACKGROUND = os.getenv('AZURE_UPLOAD_IN_BACKGROUND', 'False') == 'True'
+AZURE_UPLOAD_WORKERS = int(os.getenv('AZURE_UPLOAD_WORKERS', 4))
+# Uploads queued or running at once; further uploads are refused with 503
+AZURE_UPLOAD_MAX_PENDING = int(os.getenv('AZURE_UPLOAD_MAX_PENDING', 16))
+
 # MSAL OAuth Configuration
 MSAL_CLIENT_ID = os.getenv('MSAL_CLIENT_ID', '')
 MSAL_TENANT_ID = os.getenv('MSAL_TENANT_ID', '')
 MSAL_AUTHORITY = f"https://login.microsoftonline.com/{MSAL_TENANT_ID}"
 MSAL_SCOPE = ["User.Read"]
+# Verify token signatures against Azure AD's signing keys (required in production)
+MSAL_VERIFY_SIGNATURE = os.getenv('MSAL_VERIFY_SIGNATURE', 'False') == 'True'
 
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'fileupload.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
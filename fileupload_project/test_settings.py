@@ -0,0 +1,25 @@
+"""
+Django settings for running the test suite.
+
+Usage:
+    python manage.py test --settings=fileupload_project.test_settings
+
+Extends the project settings with faster test-only database and password
+hashing configuration.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+# Create test tables straight from the models instead of running migrations
+MIGRATION_MODULES = {app.rsplit('.', 1)[-1]: None for app in INSTALLED_APPS}  # noqa: F405
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
@@ -1,5 +1,11 @@
 #!/usr/bin/env python
-"""Django's command-line utility for administrative tasks."""
+"""
+Django's command-line utility for administrative tasks.
+
+Run the test suite across one worker process per CPU core with:
+
+    python manage.py test --parallel=auto --settings=fileupload_project.test_settings
+"""
 import os
 import sys
 
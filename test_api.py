@@ -8,23 +8,33 @@ This script tests:
 3. List files endpoint (with mock auth token)
 4. Authentication validation
 """
+import functools
 import requests
 import jwt
-from datetime import datetime, timedelta, timezone
+import time
 
 BASE_URL = "http://localhost:8000/api"
 
-def generate_test_token():
-    """Generate a test JWT token for demonstration."""
-    payload = {
-        'oid': 'test-user-123',
-        'preferred_username': 'testuser@example.com',
-        'name': 'Test User',
-        'exp': (datetime.now(timezone.utc) + timedelta(hours=1)).timestamp(),
-        'iat': datetime.now(timezone.utc).timestamp()
-    }
+TEST_CLAIMS = {
+    'oid': 'test-user-123',
+    'preferred_username': 'testuser@example.com',
+    'name': 'Test User',
+}
+
+@functools.lru_cache(maxsize=8)
+def _sign_test_token(exp, oid):
+    """Sign a test token; cached so identical tokens are only signed once."""
+    # exp is 61 minutes after the start of the minute the token is issued in,
+    # so iat never lies in the future
+    payload = dict(TEST_CLAIMS, oid=oid, exp=exp, iat=exp - 3660)
     return jwt.encode(payload, 'secret', algorithm='HS256')
 
+def generate_test_token(oid=TEST_CLAIMS['oid']):
+    """Generate a test JWT token for demonstration, valid for about an hour."""
+    # Round expiry up to the next minute so calls within a minute share a token
+    exp = (int(time.time()) // 60 + 61) * 60
+    return _sign_test_token(exp, oid)
+
 def test_health_check():
     """Test the health check endpoint (no auth required)."""
     print("\n=== Testing Health Check Endpoint ===")